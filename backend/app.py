@@ -3,7 +3,6 @@ import time
 from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
-from groq import Groq
 import json
 import random
 import re
@@ -11,6 +10,8 @@ import datetime
 import sqlite3
 import signal
 import sys
+import threading
+from snapshot import DailySnapshot, SnapshotError, find_snapshot, write_snapshot
 
 test_mode_model_quick = True  # Set to True for quick testing, False for full model
 
@@ -29,8 +30,30 @@ class Colors:
     RED = '\033[91m'
     END = '\033[0m'
 
-# Initialize Groq client
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+# Groq client, created on first use so importing the app stays cheap
+client = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from groq import Groq  # Deferred: the groq/httpx import dominates startup time
+
+                client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    return client
+
+# Minimum share of today's questions that must be cached before /readyz reports ready
+READY_MIN_CACHED_PERCENT = float(os.environ.get("READY_MIN_CACHED_PERCENT", "100"))
+
+# Backoff (seconds) between attempts when generating a question fails during prefetch
+PREFETCH_RETRY_BASE_DELAY = 1
+PREFETCH_RETRY_MAX_DELAY = 300
+
+# Read-only replica mode: answer /get_question from today's memory-mapped snapshot instead of SQLite
+SERVE_FROM_SNAPSHOT = os.environ.get("SERVE_FROM_SNAPSHOT") == "1"
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
 
 app = Flask(__name__)
 
@@ -61,13 +84,20 @@ def handle_options(path):
     return response
 
 # --- Database Functions ---
+db_initialized = False
+
 def get_db_connection():
     conn = sqlite3.connect("questions.db")
     conn.row_factory = sqlite3.Row  # Access columns by name
+    if not db_initialized:
+        init_db(conn)  # Schema is created lazily on the first connection
     return conn
 
-def init_db():
-    conn = get_db_connection()
+def init_db(conn=None):
+    global db_initialized
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect("questions.db")
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -78,7 +108,9 @@ def init_db():
     """
     )
     conn.commit()
-    conn.close()
+    if own_conn:
+        conn.close()
+    db_initialized = True
 
 def get_daily_questions_table_name():
     today = datetime.date.today()
@@ -170,9 +202,6 @@ def signal_handler(sig, frame):
         print(f"{Colors.GREEN}Database connection closed.{Colors.END}")
     sys.exit(0)
 
-signal.signal(signal.SIGINT, signal_handler)  # Handle Ctrl+C
-signal.signal(signal.SIGTERM, signal_handler)  # Handle termination signal
-
 # --- IQ Calculation and Interpretation ---
 
 iq_interpretation = {
@@ -240,7 +269,7 @@ def generate_groq_question(question_data):
     print(
         f"{Colors.BLUE}[Automata Cognitive Test] Translate to English Prompt: {translate_to_english_prompt}{Colors.END}"
     )
-    chat_completion_english = client.chat.completions.create(
+    chat_completion_english = get_llm_client().chat.completions.create(
         messages=[
             {
                 "role": "user",
@@ -265,7 +294,7 @@ def generate_groq_question(question_data):
     print(
         f"{Colors.BLUE}[Automata Cognitive Test] Generate English Prompt: {generate_english_question_prompt}{Colors.END}"
     )
-    chat_completion_new_english = client.chat.completions.create(
+    chat_completion_new_english = get_llm_client().chat.completions.create(
         messages=[
             {
                 "role": "user",
@@ -290,7 +319,7 @@ def generate_groq_question(question_data):
     print(
         f"{Colors.BLUE}[Automata Cognitive Test] Translate Back to Indonesia Prompt: {translate_back_prompt}{Colors.END}"
     )
-    chat_completion_indonesian = client.chat.completions.create(
+    chat_completion_indonesian = get_llm_client().chat.completions.create(
         messages=[
             {
                 "role": "user",
@@ -311,7 +340,7 @@ def generate_groq_question(question_data):
     ]
     audit_prompt = "\n".join(audit_prompt)
     print(f"{Colors.BLUE}[Automata Cognitive Test] Self Audit Prompt: {audit_prompt}{Colors.END}")
-    chat_completion_audit = client.chat.completions.create(
+    chat_completion_audit = get_llm_client().chat.completions.create(
         messages=[
             {
                 "role": "user",
@@ -338,7 +367,7 @@ def generate_groq_question(question_data):
         regeneration_prompt = "\n".join(regeneration_prompt)
         print(f"{Colors.BLUE}[Automata Cognitive Test] Regeneration Prompt: {regeneration_prompt}{Colors.END}")
 
-        chat_completion_regeneration = client.chat.completions.create(
+        chat_completion_regeneration = get_llm_client().chat.completions.create(
             messages=[
                 {
                     "role": "user",
@@ -500,7 +529,7 @@ def generate_groq_feedback(
     prompt = "\n".join(prompt_parts)
     print(f"{Colors.BLUE}[Automata Cognitive Test] Feedback Prompt: {prompt}{Colors.END}")
     # Generate content using Groq
-    chat_completion = client.chat.completions.create(
+    chat_completion = get_llm_client().chat.completions.create(
         messages=[
             {
                 "role": "user",
@@ -525,7 +554,7 @@ def generate_groq_feedback(
     prompt_html = "\n".join(HTMLReformat)
     print(f"{Colors.BLUE}[Automata Cognitive Test] HTML Prompt: {prompt_html}{Colors.END}")
     # Generate content using Groq
-    response_html = client.chat.completions.create(
+    response_html = get_llm_client().chat.completions.create(
         messages=[
             {
                 "role": "user",
@@ -552,37 +581,130 @@ def prefetch_questions(original_questions):
     daily_questions_table_name = get_daily_questions_table_name()
     create_daily_questions_table(conn)
 
-    generated_count = get_generation_progress()
+    # Resume by the indexes actually missing from today's table, so a gap left by an earlier run is filled
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT question_index FROM {daily_questions_table_name}")
+    cached_indexes = {row["question_index"] for row in cursor.fetchall()}
+    missing_indexes = [i for i in range(len(original_questions)) if i not in cached_indexes]
 
-    if generated_count >= len(original_questions):
+    if not missing_indexes:
         print(f"{Colors.GREEN}Questions for today already prefetched.{Colors.END}")
         conn.close()
+        export_daily_snapshot(len(original_questions))
         return  # Exit early if already prefetched
 
-    for i, question in enumerate(original_questions):
-        if i < generated_count:
-            continue
-
+    for i in missing_indexes:
         print(f"{Colors.BLUE}Generating question index {i}...{Colors.END}")
-        new_question_data = generate_groq_question(question)
-
-        if new_question_data:
-            if "error" in new_question_data:
-                print(
-                    f"{Colors.RED}Error generating question index {i}: {new_question_data['error']}{Colors.END}"
-                )
-            else:
-                cache_question(i, new_question_data)
-                generated_count += 1
-                print(f"{Colors.GREEN}Cached question index {i}{Colors.END}")
-        else:
-            print(f"{Colors.RED}Failed to generate and cache question index {i}{Colors.END}")
+        new_question_data = generate_question_with_retry(i, original_questions[i])
+        cache_question(i, new_question_data)
+        print(f"{Colors.GREEN}Cached question index {i}{Colors.END}")
 
         # No need to yield progress updates at startup
         # time.sleep(2)  # Delay removed for faster startup
 
     print(f"{Colors.GREEN}Prefetching complete.{Colors.END}")
     conn.close()
+    export_daily_snapshot(len(original_questions))
+
+# --- Daily Snapshot ---
+
+daily_snapshot = None
+rejected_snapshot = None  # (path, mtime, error) of the last file that failed validation
+_snapshot_lock = threading.Lock()
+
+def export_daily_snapshot(expected_count):
+    # Only complete sets are exported. prefetch_questions retries every index until it is cached,
+    # so once it returns the set is complete and this export always goes ahead.
+    daily_questions = get_daily_questions()
+    missing_indexes = [i for i in range(expected_count) if i not in daily_questions]
+    if missing_indexes:
+        print(
+            f"{Colors.YELLOW}Snapshot not exported: question indexes {missing_indexes} are not cached yet.{Colors.END}"
+        )
+        return None
+
+    # Store the exact /get_question response body so replicas serve it without re-encoding
+    bodies = {
+        question_index: json.dumps({"question": question_data, "generation_percentage": 100}).encode("utf-8")
+        for question_index, question_data in daily_questions.items()
+    }
+    try:
+        path = write_snapshot(SNAPSHOT_DIR, datetime.date.today(), bodies)
+    except OSError as e:
+        print(f"{Colors.RED}Failed to export daily snapshot: {e}{Colors.END}")
+        return None
+    print(f"{Colors.GREEN}Daily snapshot exported to {path}{Colors.END}")
+    return path
+
+def get_daily_snapshot():
+    # Maps (and checksums) today's snapshot once and swaps to the next day's file when the date changes.
+    # The previous map is left to the garbage collector since other threads may still be reading it.
+    # A file that failed validation is not re-read until it is replaced or modified.
+    global daily_snapshot, rejected_snapshot
+    today = datetime.date.today()
+    snapshot = daily_snapshot
+    if snapshot is not None and snapshot.date == today:
+        return snapshot
+    with _snapshot_lock:
+        if daily_snapshot is None or daily_snapshot.date != today:
+            path = find_snapshot(SNAPSHOT_DIR, today)
+            if path is None:
+                return None
+            mtime = os.path.getmtime(path)
+            if rejected_snapshot is not None and rejected_snapshot[:2] == (path, mtime):
+                raise rejected_snapshot[2]
+            try:
+                daily_snapshot = DailySnapshot(path, expected_date=today)
+            except SnapshotError as e:
+                rejected_snapshot = (path, mtime, e)
+                raise
+        return daily_snapshot
+
+prefetch_error = None
+prefetch_failed = False
+
+def generate_question_with_retry(question_index, question):
+    # Retries with backoff until a usable question comes back, so today's set always completes.
+    # Covers Groq errors (missing key, rate limits, network) as well as self-audit rejections and unparseable output.
+    global prefetch_error
+    attempt = 0
+    while True:
+        try:
+            new_question_data = generate_groq_question(question)
+        except Exception as e:
+            reason = str(e)
+        else:
+            if new_question_data and "error" not in new_question_data:
+                prefetch_error = None
+                return new_question_data
+            if new_question_data:
+                reason = new_question_data["error"]
+            else:
+                reason = "LLM rejected the question or returned no usable JSON"
+
+        delay = min(PREFETCH_RETRY_MAX_DELAY, PREFETCH_RETRY_BASE_DELAY * 2**attempt)
+        prefetch_error = f"Question index {question_index}: {reason}"
+        print(
+            f"{Colors.RED}Failed to generate question index {question_index}: {reason}. Retrying in {delay}s{Colors.END}"
+        )
+        time.sleep(delay)
+        attempt += 1
+
+def start_background_prefetch():
+    # Runs prefetch off the main thread so the server can bind its port immediately.
+    def run():
+        global prefetch_error, prefetch_failed
+        try:
+            prefetch_questions(load_questions())
+        except Exception as e:
+            # Unrecoverable (e.g. bad questions.json or database): fail /healthz so the instance gets restarted.
+            prefetch_error = str(e)
+            prefetch_failed = True
+            print(f"{Colors.RED}Background prefetch failed: {e}{Colors.END}")
+
+    thread = threading.Thread(target=run, name="prefetch", daemon=True)
+    thread.start()
+    return thread
 
 @app.route("/get_question", methods=["POST"])
 def get_question():
@@ -600,24 +722,105 @@ def get_question():
     question_index = data["question_index"]
     print(f"{Colors.BLUE}[Automata Cognitive Test] Processing question index: {question_index}{Colors.END}")
 
+    if SERVE_FROM_SNAPSHOT:
+        return get_question_from_snapshot(question_index)
+
     daily_questions = get_daily_questions()
     if question_index in daily_questions:
         return jsonify({"question": daily_questions[question_index], "generation_percentage": 100})
     else:
         return jsonify({"error": f"Question index {question_index} not found in today's questions"}), 404
 
+def get_question_from_snapshot(question_index):
+    try:
+        snapshot = get_daily_snapshot()
+    except (OSError, SnapshotError, ValueError) as e:
+        print(f"{Colors.RED}[Automata Cognitive Test] Failed to open daily snapshot: {e}{Colors.END}")
+        return jsonify({"error": "Today's question snapshot is unavailable"}), 503
+    if snapshot is None:
+        return jsonify({"error": "Today's question snapshot is not available yet"}), 503
+
+    body = snapshot.get(question_index) if isinstance(question_index, int) else None
+    if body is None:
+        return jsonify({"error": f"Question index {question_index} not found in today's questions"}), 404
+    return Response(body, mimetype="application/json")
+
 @app.route("/get_prefetch_progress")
 def get_prefetch_progress():
     original_questions = load_questions()
     return Response(prefetch_questions(original_questions), mimetype="text/event-stream")
 
+# --- Health Probes ---
+
+@app.route("/healthz")
+def healthz():
+    # Liveness only: no database or LLM access, so it answers as soon as the port is bound.
+    if prefetch_failed:
+        return jsonify({"status": "error", "error": prefetch_error}), 503
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    if SERVE_FROM_SNAPSHOT:
+        return snapshot_readyz()
+    try:
+        total_questions = len(load_questions())
+        conn = get_db_connection()
+        table_name = get_daily_questions_table_name()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+        cached_count = 0
+        if cursor.fetchone()[0]:
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            cached_count = cursor.fetchone()[0]
+        conn.close()
+    except (sqlite3.Error, OSError, ValueError) as e:
+        return jsonify({"status": "not_ready", "error": str(e), "prefetch_error": prefetch_error}), 503
+
+    cached_percentage = cached_count * 100 / total_questions if total_questions else 100.0
+    ready = cached_percentage >= READY_MIN_CACHED_PERCENT
+    return jsonify(
+        {
+            "status": "ready" if ready else "not_ready",
+            "cached": cached_count,
+            "total": total_questions,
+            "cached_percentage": round(cached_percentage, 2),
+            "required_percentage": READY_MIN_CACHED_PERCENT,
+            "prefetch_error": prefetch_error,
+        }
+    ), (200 if ready else 503)
+
+def snapshot_readyz():
+    # Replicas never open SQLite; they are ready once today's snapshot maps cleanly.
+    try:
+        total_questions = len(load_questions())
+        snapshot = get_daily_snapshot()
+    except (OSError, SnapshotError, ValueError) as e:
+        return jsonify({"status": "not_ready", "error": str(e)}), 503
+    if snapshot is None:
+        return jsonify({"status": "not_ready", "error": "No snapshot for today"}), 503
+
+    cached_count = snapshot.count()
+    cached_percentage = cached_count * 100 / total_questions if total_questions else 100.0
+    ready = cached_percentage >= READY_MIN_CACHED_PERCENT
+    return jsonify(
+        {
+            "status": "ready" if ready else "not_ready",
+            "cached": cached_count,
+            "total": total_questions,
+            "cached_percentage": round(cached_percentage, 2),
+            "required_percentage": READY_MIN_CACHED_PERCENT,
+            "snapshot": os.path.basename(snapshot.path),
+        }
+    ), (200 if ready else 503)
+
 # --- Other Routes ---
 
 @app.route("/test_llm_connection", methods=["GET"])
 def test_llm_connection():
     try:
         # Use Groq client to generate content
-        chat_completion = client.chat.completions.create(
+        chat_completion = get_llm_client().chat.completions.create(
             messages=[
                 {
                     "role": "user",
@@ -705,10 +908,12 @@ def load_questions():
 
 
 if __name__ == "__main__":
-    init_db()
-    try:
-        original_questions = load_questions()
-        prefetch_questions(original_questions)  # Prefetch at startup
-        app.run(debug=True, port=8081)
-    except ValueError as e:
-        print(f"Error loading questions: {e}")
\ No newline at end of file
+    signal.signal(signal.SIGINT, signal_handler)  # Handle Ctrl+C
+    signal.signal(signal.SIGTERM, signal_handler)  # Handle termination signal
+
+    debug = True
+    # With the debug reloader the parent process only watches files; prefetch in the serving child.
+    # Snapshot replicas only read; generation stays with the instance that owns questions.db.
+    if not SERVE_FROM_SNAPSHOT and (not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+        start_background_prefetch()
+    app.run(debug=debug, port=int(os.environ.get("PORT", 8081)))
\ No newline at end of file
@@ -0,0 +1,552 @@
+"""Offline load test, micro-benchmarks and startup timing for the Flask backend.
+
+Runs entirely on this machine: the app is served on a loopback port and every
+Groq call is replaced by a stub that sleeps for --llm-latency-ms. The database
+is a throwaway copy in a temp directory, so questions.db is never touched.
+Startup is measured by launching `python app.py` against that copy and timing
+the import, the first /healthz answer and the first ready /readyz answer.
+
+The simulated clients and the werkzeug server are threads of this one
+process, so they share the GIL: load-test latencies include that client-side
+contention and are much higher than the server-side cost of a request (a
+single SQLite read is well under a millisecond). Compare them with each other
+and with the baseline, not with production numbers.
+
+Baselines are stored per --question-source in benchmark_baseline.json. A run
+with no comparable baseline (other source or workload settings) exits 1
+unless --no-baseline is given.
+
+    python benchmark.py --users 20
+    python benchmark.py --question-source snapshot  # replicas serving from the mmap snapshot
+    python benchmark.py --save-baseline          # refresh benchmark_baseline.json
+    python benchmark.py --output bench.json      # exit code 1 on regression
+    python benchmark.py --users 50 --no-baseline # ad-hoc run, no comparison
+"""
+import argparse
+import contextlib
+import glob
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import resource
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+from snapshot import DailySnapshot
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmark_baseline.json")
+
+STUB_QUESTION = {
+    "question": "Angka berapa yang HILANG dalam urutan angka ini: 3 6 12 ? 48 96",
+    "answers": [{"text": "18"}, {"text": "20"}, {"text": "24"}, {"text": "30"}, {"text": "36"}],
+    "correctAnswerIndex": 2,
+}
+
+# --- Groq Stub ---
+
+class StubGroqClient:
+    """Stands in for groq.Groq: same call shape, fixed latency, canned reply."""
+
+    def __init__(self, latency_s):
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, messages, model):
+        with self._lock:
+            self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        # Ends in a JSON object so generate_groq_question's regeneration step parses it.
+        content = "<think>stub</think>\n" + json.dumps(STUB_QUESTION)
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+# --- Stats ---
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile; sorted_values must be non-empty and sorted.
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(samples_s):
+    values = sorted(samples_s)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 2)
+
+# --- Environment ---
+
+def load_app(workdir, stub):
+    """Import app.py with its cwd pointed at a scratch copy of the data files."""
+    shutil.copy(os.path.join(BACKEND_DIR, "questions.json"), workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import app as backend
+    backend.client = stub
+    return backend
+
+def reset_daily_table(backend):
+    conn = backend.get_db_connection()
+    conn.execute(f"DROP TABLE IF EXISTS {backend.get_daily_questions_table_name()}")
+    conn.execute("DELETE FROM generation_progress")
+    conn.commit()
+    backend.create_daily_questions_table(conn)
+    conn.close()
+
+def seed_daily_questions(backend, original_questions):
+    reset_daily_table(backend)
+    for i, question in enumerate(original_questions):
+        backend.cache_question(i, question)
+
+# --- Load Test ---
+
+def post_json(conn, path, payload):
+    body = json.dumps(payload)
+    conn.request(
+        "POST",
+        path,
+        body=body,
+        headers={"Content-Type": "application/json", "Accept": "application/json"},
+    )
+    response = conn.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path} returned HTTP {response.status}: {data[:200]!r}")
+    return json.loads(data)
+
+def run_test_taker(port, total_questions, back_prob, think_s, rng, samples, lock):
+    """Replays the frontend/script.js flow for one test-taker."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    local = {"get_question": [], "process_iq_test": []}
+
+    def fetch(question_index):
+        started = time.perf_counter()
+        payload = post_json(conn, "/get_question", {"question_index": question_index})
+        local["get_question"].append(time.perf_counter() - started)
+        return payload["question"]
+
+    shuffled = list(range(total_questions))
+    rng.shuffle(shuffled)
+    user_responses = []
+    overall_score = 0
+    for position, question_index in enumerate(shuffled):
+        question = fetch(question_index)
+        if think_s:
+            time.sleep(think_s)
+        # Previous only re-renders, but the following Next re-fetches the same index.
+        if position > 0 and rng.random() < back_prob:
+            question = fetch(question_index)
+        selected = rng.randrange(len(question["answers"]))
+        correct = selected == question["correctAnswerIndex"]
+        overall_score += correct
+        user_responses.append(
+            {
+                "question": question["question"],
+                "answer": question["answers"][selected]["text"],
+                "correct": correct,
+                "category": str(question.get("category", "Unknown")),
+            }
+        )
+
+    category_scores = {}
+    for response in user_responses:
+        entry = category_scores.setdefault(response["category"], {"score": 0, "responses": []})
+        entry["score"] += response["correct"]
+        entry["responses"].append(response)
+
+    started = time.perf_counter()
+    post_json(
+        conn,
+        "/process_iq_test",
+        {"overall_score": overall_score, "category_scores": category_scores, "user_responses": user_responses},
+    )
+    local["process_iq_test"].append(time.perf_counter() - started)
+    conn.close()
+
+    with lock:
+        for name, values in local.items():
+            samples[name].extend(values)
+
+def run_load_test(backend, users, back_prob, think_s, seed):
+    from werkzeug.serving import make_server
+
+    total_questions = len(backend.load_questions())
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No per-request access log.
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    samples = {"get_question": [], "process_iq_test": []}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(user_id):
+        try:
+            run_test_taker(
+                server.server_port, total_questions, back_prob, think_s, random.Random(seed + user_id), samples, lock
+            )
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    total_requests = sum(len(values) for values in samples.values())
+    return {
+        "users": users,
+        "wall_s": round(elapsed, 3),
+        "requests": total_requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "sessions_per_s": round((users - len(errors)) / elapsed, 3) if elapsed else 0.0,
+        "endpoints": {name: summarize(values) for name, values in samples.items()},
+    }
+
+# --- Startup ---
+
+def measure_import_s(workdir):
+    code = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=workdir, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def probe(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        conn.request("GET", path)
+        return conn.getresponse().status
+    except OSError:
+        return None
+    finally:
+        conn.close()
+
+def measure_boot(workdir, timeout_s, extra_env):
+    """Seconds from `python app.py` until /healthz, then /readyz, return 200."""
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), **extra_env)
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "app.py")],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,  # The debug reloader forks a child; kill the whole group afterwards.
+    )
+    timings = {"healthz_s": None, "readyz_s": None}
+    try:
+        for key, path in (("healthz_s", "/healthz"), ("readyz_s", "/readyz")):
+            while time.perf_counter() - started < timeout_s:
+                if probe(port, path) == 200:
+                    timings[key] = time.perf_counter() - started
+                    break
+                time.sleep(0.01)
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait()
+    return timings
+
+def run_startup_benchmark(workdir, max_import_ms, max_healthz_ms, timeout_s, extra_env):
+    import_samples = sorted(measure_import_s(workdir) for _ in range(3))
+    boot = measure_boot(workdir, timeout_s, extra_env)
+    import_ms = round(import_samples[1] * 1000, 1)
+    healthz_ms = round(boot["healthz_s"] * 1000, 1) if boot["healthz_s"] is not None else None
+    readyz_ms = round(boot["readyz_s"] * 1000, 1) if boot["readyz_s"] is not None else None
+    return {
+        "import_ms": import_ms,
+        "healthz_ms": healthz_ms,
+        "readyz_ms": readyz_ms,
+        "targets": {"import_ms": max_import_ms, "healthz_ms": max_healthz_ms},
+        "targets_met": import_ms <= max_import_ms and healthz_ms is not None and healthz_ms <= max_healthz_ms,
+    }
+
+# --- Micro-benchmarks ---
+
+def time_calls(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def run_micro_benchmarks(backend, original_questions, stub, repeat):
+    results = {}
+    saved_latency = stub.latency_s
+    stub.latency_s = 0  # Measure our own overhead, not the simulated LLM.
+
+    seed_daily_questions(backend, original_questions)
+    results["get_daily_questions"] = time_calls(backend.get_daily_questions, repeat)
+
+    # One sample per cache_question call; the table is rebuilt each round so every insert is fresh.
+    cache_samples = []
+    for _ in range(max(1, repeat // len(original_questions))):
+        reset_daily_table(backend)
+        for i, question in enumerate(original_questions):
+            started = time.perf_counter()
+            backend.cache_question(i, question)
+            cache_samples.append(time.perf_counter() - started)
+    results["cache_question"] = summarize(cache_samples)
+
+    def prefetch_from_empty():
+        reset_daily_table(backend)
+        backend.prefetch_questions(original_questions)
+
+    results["prefetch_questions"] = time_calls(prefetch_from_empty, max(1, repeat // 20))
+
+    def export_from_scratch():
+        for path in glob.glob(os.path.join(backend.SNAPSHOT_DIR, "*.snap")):
+            os.remove(path)
+        backend.export_daily_snapshot(len(original_questions))
+
+    seed_daily_questions(backend, original_questions)
+    # Dominated by fsync, which is noisy, so take more samples than the other file-writing benchmarks.
+    results["export_daily_snapshot"] = time_calls(export_from_scratch, max(5, repeat // 4))
+
+    # Reads every index once per sample, the way a full test session would.
+    snapshot = DailySnapshot(backend.export_daily_snapshot(len(original_questions)))
+    indexes = range(len(original_questions))
+    results["snapshot_get_all"] = time_calls(lambda: [snapshot.get(i) for i in indexes], repeat)
+    snapshot.close()
+
+    questions_and_answers = [
+        {
+            "question": q["question"],
+            "answer": q["answers"][0]["text"],
+            "correct": i % 2 == 0,
+            "category": str(q.get("category", "Unknown")),
+        }
+        for i, q in enumerate(original_questions)
+    ]
+    overall_score = sum(qa["correct"] for qa in questions_and_answers)
+    iq_score = backend.calculate_iq(overall_score)
+    iq_level_description = backend.get_iq_level_description(overall_score)
+    results["generate_groq_feedback"] = time_calls(
+        lambda: backend.generate_groq_feedback(
+            overall_score, iq_score, iq_level_description, questions_and_answers, {}
+        ),
+        repeat,
+    )
+
+    stub.latency_s = saved_latency
+    return results
+
+# --- Baseline Comparison ---
+
+# Settings that change the workload; the interpreter version is only reported.
+WORKLOAD_KEYS = ("users", "llm_latency_ms", "back_prob", "think_ms", "repeat", "seed", "question_source")
+
+# Reported but not checked: runs once a day off the serving path and its time is mostly fsync, which is too noisy to gate on.
+UNGATED_MICRO = {"export_daily_snapshot"}
+
+def collect_metrics(report):
+    """Flattens the report into the latency figures that are checked against the baseline."""
+    metrics = {}
+    for name, stats in report["load_test"]["endpoints"].items():
+        if stats.get("count"):
+            metrics[f"load_test.{name}.p95_ms"] = stats["p95_ms"]
+    for name, stats in report["micro"].items():
+        if name in UNGATED_MICRO:
+            continue
+        metrics[f"micro.{name}.p50_ms"] = stats["p50_ms"]
+    for name in ("import_ms", "healthz_ms", "readyz_ms"):
+        if report["startup"][name] is not None:
+            metrics[f"startup.{name}"] = report["startup"][name]
+    return metrics
+
+def load_baselines(path):
+    """Returns {question_source: {"config": ..., "metrics": ...}} from the baseline file."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def compare_to_baseline(report, baseline, tolerance, min_regression_ms):
+    # Numbers from a different workload are not comparable, so only like-for-like runs are checked.
+    baseline_config = baseline.get("config", {})
+    if any(baseline_config.get(key) != report["config"][key] for key in WORKLOAD_KEYS):
+        return None
+    current = collect_metrics(report)
+    previous = baseline.get("metrics", {})
+    regressions = []
+    for key, value in current.items():
+        if key not in previous:
+            continue
+        # Sub-millisecond timings jitter by well over any relative tolerance, so small absolute gaps are ignored.
+        limit = max(previous[key] * (1 + tolerance), previous[key] + min_regression_ms)
+        if value > limit:
+            regressions.append({"metric": key, "baseline": previous[key], "current": value, "limit": round(limit, 3)})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test and micro-benchmarks for the WPT backend.")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated test-takers.")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0, help="Latency of each stubbed Groq call.")
+    parser.add_argument("--back-prob", type=float, default=0.2, help="Chance of a Previous/Next round-trip per question.")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between answering questions.")
+    parser.add_argument("--repeat", type=int, default=200, help="Iterations per micro-benchmark.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument(
+        "--question-source",
+        choices=("sqlite", "snapshot"),
+        default="sqlite",
+        help="Serve /get_question from questions.db or from the exported daily snapshot.",
+    )
+    parser.add_argument("--max-import-ms", type=float, default=400.0, help="Startup target for `import app`.")
+    parser.add_argument("--max-healthz-ms", type=float, default=3000.0, help="Startup target for first /healthz.")
+    parser.add_argument("--boot-timeout-s", type=float, default=30.0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown vs baseline (0.5 = +50%%).")
+    parser.add_argument(
+        "--min-regression-ms",
+        type=float,
+        default=1.0,
+        help="Ignore slowdowns smaller than this many milliseconds, whatever the tolerance.",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store this run as the baseline for its --question-source."
+    )
+    parser.add_argument(
+        "--no-baseline", action="store_true", help="Skip the baseline comparison, e.g. for ad-hoc workloads."
+    )
+    args = parser.parse_args()
+
+    stub = StubGroqClient(args.llm_latency_ms / 1000.0)
+    workdir = tempfile.mkdtemp(prefix="wpt-bench-")
+    try:
+        backend = load_app(workdir, stub)
+        # app.py logs every request and LLM prompt; keep that out of the timings and the report.
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            backend.init_db()
+            original_questions = backend.load_questions()
+            micro = run_micro_benchmarks(backend, original_questions, stub, args.repeat)
+            seed_daily_questions(backend, original_questions)
+            backend.SERVE_FROM_SNAPSHOT = args.question_source == "snapshot"
+            if backend.SERVE_FROM_SNAPSHOT:
+                backend.export_daily_snapshot(len(original_questions))
+            load_test = run_load_test(backend, args.users, args.back_prob, args.think_ms / 1000.0, args.seed)
+        # Runs against the seeded copy, so /readyz can go green without any Groq calls.
+        startup_env = {"SERVE_FROM_SNAPSHOT": "1"} if backend.SERVE_FROM_SNAPSHOT else {}
+        startup = run_startup_benchmark(
+            workdir, args.max_import_ms, args.max_healthz_ms, args.boot_timeout_s, startup_env
+        )
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "config": {
+            "users": args.users,
+            "llm_latency_ms": args.llm_latency_ms,
+            "back_prob": args.back_prob,
+            "think_ms": args.think_ms,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "question_source": args.question_source,
+            "python": sys.version.split()[0],
+        },
+        "load_test": load_test,
+        "micro": micro,
+        "startup": startup,
+        "llm_stub_calls": stub.calls,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    regressions = []
+    missing_baseline = False
+    if args.save_baseline:
+        baselines = load_baselines(args.baseline)
+        baselines[args.question_source] = {"config": report["config"], "metrics": collect_metrics(report)}
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+    elif not args.no_baseline:
+        baseline = load_baselines(args.baseline).get(args.question_source)
+        if baseline is not None:
+            regressions = compare_to_baseline(report, baseline, args.tolerance, args.min_regression_ms)
+        else:
+            regressions = None
+        report["baseline"] = {
+            "path": args.baseline,
+            "question_source": args.question_source,
+            "tolerance": args.tolerance,
+            "min_regression_ms": args.min_regression_ms,
+            "compared": regressions is not None,
+            "regressions": regressions or [],
+        }
+        warnings = []
+        if regressions is None:
+            # Passing silently here would let regressions through, so an uncomparable run fails.
+            missing_baseline = True
+            warnings.append(
+                f"no baseline for question_source={args.question_source} with these workload settings; "
+                "run with --save-baseline to record one or --no-baseline to skip the comparison"
+            )
+        baseline_python = (baseline or {}).get("config", {}).get("python")
+        if baseline is not None and baseline_python != report["config"]["python"]:
+            warnings.append(
+                f"baseline was recorded on Python {baseline_python}, this run uses {report['config']['python']}"
+            )
+        if warnings:
+            report["baseline"]["warnings"] = warnings
+            for warning in warnings:
+                print(f"warning: {warning}", file=sys.stderr)
+        regressions = regressions or []
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if load_test["errors"] or regressions or missing_baseline or not startup["targets_met"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
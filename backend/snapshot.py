@@ -0,0 +1,172 @@
+"""Immutable, memory-mapped snapshots of a day's generated questions.
+
+A snapshot holds the ready-to-send /get_question response body for every
+question_index of one day, so read-only replicas can serve questions from a
+single copied file without opening questions.db. Layout (little-endian):
+
+    header   magic "WPTSNAP1", format version (u16), date "YYYY-MM-DD",
+             sha256 of the data section, slot count (u32)
+    index    one (offset u64, length u32) entry per question_index;
+             length 0 marks a missing index
+    data     the JSON bodies back to back; offsets are absolute
+
+Files are named questions_YYYY_MM_DD.<digest>.snap, written atomically and
+made read-only, so a given file name always refers to the same bytes.
+
+    python snapshot.py export        # export today's set from questions.db
+"""
+import datetime
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+MAGIC = b"WPTSNAP1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sH10s32sI")
+INDEX_ENTRY = struct.Struct("<QI")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_prefix(date):
+    return f"questions_{date.strftime('%Y_%m_%d')}"
+
+
+def write_snapshot(directory, date, bodies):
+    """Writes {question_index: bytes} for `date` and returns the snapshot path.
+
+    Exporting identical content again is a no-op that returns the existing file.
+    """
+    slot_count = max(bodies) + 1 if bodies else 0
+    data_start = HEADER.size + INDEX_ENTRY.size * slot_count
+    index = bytearray(INDEX_ENTRY.size * slot_count)
+    digest = hashlib.sha256()
+    offset = data_start
+    for question_index in sorted(bodies):
+        body = bodies[question_index]
+        INDEX_ENTRY.pack_into(index, INDEX_ENTRY.size * question_index, offset, len(body))
+        digest.update(body)
+        offset += len(body)
+    digest = digest.digest()
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{snapshot_prefix(date)}.{digest.hex()[:16]}.snap")
+    if os.path.exists(path):
+        return path
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, date.isoformat().encode("ascii"), digest, slot_count)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(index)
+            for question_index in sorted(bodies):
+                f.write(bodies[question_index])
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def find_snapshot(directory, date):
+    """Returns the newest snapshot file for `date` in `directory`, or None."""
+    pattern = os.path.join(glob.escape(directory), f"{snapshot_prefix(date)}.*.snap")
+    paths = glob.glob(pattern)
+    if not paths:
+        return None
+    return max(paths, key=os.path.getmtime)
+
+
+class DailySnapshot:
+    """Read-only view of a snapshot file backed by a shared memory map.
+
+    The header, index bounds and checksum are validated on open, so a
+    truncated or half-copied file is rejected instead of served. Passing
+    `expected_date` also rejects a file whose header is for another day.
+    """
+
+    def __init__(self, path, expected_date=None):
+        self.path = path
+        self.expected_date = expected_date
+        with open(path, "rb") as f:
+            try:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # mmap refuses empty files
+                raise SnapshotError(f"{path} is empty") from e
+        try:
+            self._validate()
+        except BaseException:
+            self._buffer.close()
+            raise
+
+    def _validate(self):
+        size = len(self._buffer)
+        if size < HEADER.size:
+            raise SnapshotError(f"{self.path} is too short to be a snapshot")
+        magic, version, date, digest, slot_count = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a snapshot file")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{self.path} has unsupported snapshot version {version}")
+        try:
+            self.date = datetime.date.fromisoformat(date.decode("ascii"))
+        except ValueError as e:
+            raise SnapshotError(f"{self.path} has an invalid date header") from e
+        if self.expected_date is not None and self.date != self.expected_date:
+            raise SnapshotError(f"{self.path} holds questions for {self.date}, expected {self.expected_date}")
+        self.digest = digest
+        self.slot_count = slot_count
+        self._data_start = HEADER.size + INDEX_ENTRY.size * slot_count
+        if size < self._data_start:
+            raise SnapshotError(f"{self.path} is truncated inside its index")
+
+        present = 0
+        for slot in range(slot_count):
+            offset, length = INDEX_ENTRY.unpack_from(self._buffer, HEADER.size + INDEX_ENTRY.size * slot)
+            if not length:
+                continue
+            if offset < self._data_start or offset + length > size:
+                raise SnapshotError(f"{self.path} index entry {slot} points outside the file")
+            present += 1
+        self._count = present
+
+        if hashlib.sha256(self._buffer[self._data_start :]).digest() != digest:
+            raise SnapshotError(f"{self.path} failed its checksum")
+
+    def get(self, question_index):
+        """Returns the stored response body for `question_index`, or None."""
+        if not 0 <= question_index < self.slot_count:
+            return None
+        offset, length = INDEX_ENTRY.unpack_from(self._buffer, HEADER.size + INDEX_ENTRY.size * question_index)
+        if not length:
+            return None
+        return self._buffer[offset : offset + length]
+
+    def count(self):
+        """Number of question indexes present in the snapshot."""
+        return self._count
+
+    def close(self):
+        self._buffer.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["export"]:
+        sys.exit("usage: python snapshot.py export")
+    import app
+
+    path = app.export_daily_snapshot(len(app.load_questions()))
+    if path is None:
+        sys.exit(1)
+    print(path)